@@ -1,33 +1,75 @@
-{
- "cells": [
-  {
-   "cell_type": "code",
-   "execution_count": null,
-   "id": "908b2351-4beb-4596-9247-ef6e8de22ece",
-   "metadata": {},
-   "outputs": [],
-   "source": []
-  }
- ],
- "metadata": {
-  "kernelspec": {
-   "display_name": "Python 3 (ipykernel)",
-   "language": "python",
-   "name": "python3"
-  },
-  "language_info": {
-   "codemirror_mode": {
-    "name": "ipython",
-    "version": 3
-   },
-   "file_extension": ".py",
-   "mimetype": "text/x-python",
-   "name": "python",
-   "nbconvert_exporter": "python",
-   "pygments_lexer": "ipython3",
-   "version": "3.8.10"
-  }
- },
- "nbformat": 4,
- "nbformat_minor": 5
-}
+from langchain.text_splitter import TextSplitter
+import re
+import torch, torch.nn.functional as F
+
+class ModelBasedSemanticSplitter(TextSplitter):
+    def __init__(self, model, tokenizer, device, n_std=1.0, batch_size=32):
+        super().__init__()
+        self.model = model
+        # 带任务头的模型（如 *ForSequenceClassification）只取其编码器主体，以拿到 last_hidden_state
+        self._encoder = getattr(model, "base_model", model)
+        self.tokenizer = tokenizer
+        self.device = device
+        self.n_std = n_std
+        self.batch_size = batch_size
+        # 在所有中文句末标点之后切分（标点保留在句尾）
+        self._sent_re = re.compile(r'(?<=[。！？；])')
+        # GPU 上用半精度推理，减半显存带宽
+        if torch.device(device).type == "cuda":
+            self.model.half()
+
+    def _to_device(self, batch, copy_stream):
+        """分词并搬到设备；GPU 上经锁页内存在独立的 copy stream 上异步拷贝"""
+        inputs = self.tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=128)
+        if copy_stream is None:
+            return inputs.to(self.device)
+        with torch.cuda.stream(copy_stream):
+            return {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in inputs.items()}
+
+    def get_embeddings(self, sentences):
+        # 按长度排序后分小批编码，每批只填充到批内最长句，减少 padding 上的无效计算
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        batches = [[sentences[i] for i in order[b:b + self.batch_size]] for b in range(0, len(order), self.batch_size)]
+        copy_stream = torch.cuda.Stream() if torch.device(self.device).type == "cuda" else None
+        cls = []
+        with torch.inference_mode():
+            next_inputs = self._to_device(batches[0], copy_stream)
+            for b in range(len(batches)):
+                inputs = next_inputs
+                if copy_stream is not None:
+                    compute_stream = torch.cuda.current_stream()
+                    compute_stream.wait_stream(copy_stream)
+                    for v in inputs.values():
+                        v.record_stream(compute_stream)
+                out = self._encoder(**inputs)
+                # 编码器在 GPU 上异步执行时，CPU 同时分词并拷贝下一批
+                if b + 1 < len(batches):
+                    next_inputs = self._to_device(batches[b + 1], copy_stream)
+                cls.append(out.last_hidden_state[:, 0, :].float())
+            sorted_embeds = torch.cat(cls)
+            # 逆置换回原始句子顺序
+            embeds = torch.empty_like(sorted_embeds)
+            embeds[torch.tensor(order, device=embeds.device)] = sorted_embeds
+            # 返回 L2 归一化后的 CLS 向量，相邻点积即余弦相似度
+            return F.normalize(embeds, dim=-1)
+
+    def split_text(self, text):
+        # 纯空白片段（如句末换行）并入前一句，保证各块拼接后与原文一致
+        sents = []
+        for s in self._sent_re.split(text):
+            if sents and not s.strip():
+                sents[-1] += s
+            elif s:
+                sents.append(s)
+        # 不足三句时无需编码：只有一个相似度时 std 为 0、阈值等于其本身，永远不会切分
+        if len(sents) <= 2:
+            return [text]
+        embeds = self.get_embeddings(sents)
+        # 一次性计算所有相邻句对的相似度，均值/标准差也在设备上单遍算出
+        sims = (embeds[:-1] * embeds[1:]).sum(dim=-1)
+        std, mean = torch.std_mean(sims, unbiased=False)
+        thr = mean - self.n_std * std
+        # 相似度低于阈值处切分：第 i 个相似度对应 sents[i] 与 sents[i+1] 之间；只在这里同步一次
+        cuts = (torch.nonzero(sims < thr).flatten() + 1).tolist()
+        bounds = [0] + cuts + [len(sents)]
+        return ["".join(sents[s:e]) for s, e in zip(bounds[:-1], bounds[1:])]
@@ -3,12 +3,19 @@
 
 import torch
 import json
+from itertools import chain
 from pypinyin import pinyin, Style
 
 
 class PinyinTokenizer:
-    def __init__(self, max_length=128):
+    def __init__(self, max_length=128, pin_memory=False):
+        """
+        Args:
+            max_length: 最大长度
+            pin_memory: 为 True 时输出张量分配在锁页内存上，便于 .to(device, non_blocking=True) 异步拷贝
+        """
         self.max_length = max_length
+        self.pin_memory = pin_memory
         self.pad_token = '[PAD]'
         self.unk_token = '[UNK]'
         self.cls_token = '[CLS]'
@@ -18,6 +25,9 @@ class PinyinTokenizer:
         ]
         self._build_vocab()
         self.pad_token_id = self.token2id[self.pad_token]
+        # 按音节缓存 ids：医学语料高频字多，重复音节无需再次切分和查表
+        self._syllable_cache = {}
+        self._syllable_cache_size = 65536
 
     def _build_vocab(self):
         initials = [
@@ -34,58 +44,101 @@ class PinyinTokenizer:
         vocab = self.special_tokens + initials + finals + tones
         self.token2id = {t: i for i, t in enumerate(vocab)}
         self.id2token = {i: t for t, i in self.token2id.items()}
+        self._unk_id = self.token2id[self.unk_token]
+
+        # 词表前缀树：split_pinyin 只需逐字符走一遍即可找到最长匹配前缀
+        self._prefix_trie = {}
+        for t in vocab:
+            node = self._prefix_trie
+            for c in t:
+                node = node.setdefault(c, {})
+            node[''] = True  # 终止标记
+
+        # 按前两个 ASCII 字符直接给出最长匹配前缀长度的 128x128 分派表（扁平存储，下标 c0 * 128 + c1）；
+        # 单字符时 c1 取 0。值为 -1 表示可能匹配到更长的词（如 ang、[PAD]），需回退到前缀树
+        self._split_tbl = [0] * (128 * 128)
+        for t in sorted(vocab, key=len):  # 由短到长填，长词覆盖短词
+            if not t.isascii():
+                continue
+            c0 = ord(t[0])
+            if len(t) == 1:
+                self._split_tbl[c0 * 128:(c0 + 1) * 128] = [1] * 128
+            else:
+                self._split_tbl[c0 * 128 + ord(t[1])] = 2 if len(t) == 2 else -1
+
+    def _longest_prefix(self, p_core):
+        """在词表前缀树上找 p_core 的最长匹配前缀长度"""
+        node, k = self._prefix_trie, 0
+        for i, c in enumerate(p_core):
+            node = node.get(c)
+            if node is None:
+                break
+            if '' in node:
+                k = i + 1
+        return k
 
     def split_pinyin(self, p):
         tone = p[-1] if p and p[-1].isdigit() else '5'
         p_core = p[:-1] if tone != '5' else p
 
-        for i in range(len(p_core), 0, -1):
-            if p_core[:i] in self.token2id:
-                initial = p_core[:i]
-                final = p_core[i:]
-                return [initial, final, tone]
+        c0 = ord(p_core[0]) if p_core else 0
+        c1 = ord(p_core[1]) if len(p_core) > 1 else 0
+        k = self._split_tbl[c0 * 128 + c1] if c0 < 128 and c1 < 128 else -1
+        if k < 0:
+            k = self._longest_prefix(p_core)
 
+        if k:
+            return [p_core[:k], p_core[k:], tone]
         return [self.unk_token, self.unk_token, tone]
 
+    def _syllable_ids(self, syl):
+        """单个拼音音节 -> (声母, 韵母, 声调) 的 id 元组（带缓存）"""
+        ids = self._syllable_cache.get(syl)
+        if ids is None:
+            ids = tuple(self.token2id.get(t, self._unk_id) for t in self.split_pinyin(syl))
+            if len(self._syllable_cache) < self._syllable_cache_size:
+                self._syllable_cache[syl] = ids
+        return ids
+
     def encode(self, text):
         # 转拼音
         syllables = pinyin(text, style=Style.TONE3, strict=False, errors='default')
-        ids = []
-
-        for syl in syllables:
-            # 跳过无效条目（pypinyin可能返回 []、['']、[' '])
-            if not syl or not syl[0].strip():
-                continue
-
-            tokens = self.split_pinyin(syl[0])
-            ids.extend([
-                self.token2id.get(t, self.token2id[self.unk_token]) for t in tokens
-            ])
+        # 跳过无效条目（pypinyin可能返回 []、['']、[' '])
+        flat = [syl[0] for syl in syllables if syl and syl[0].strip()]
+        # 逐音节查缓存得到 (声母, 韵母, 声调) 三元组，由 chain 在 C 层展平拼接
+        ids = list(chain.from_iterable(map(self._syllable_ids, flat)))
 
         # 保底逻辑：防止整句都为空
         if not ids:
-            ids = [self.token2id[self.unk_token]]
+            ids = [self._unk_id]
 
         return ids
 
     def __call__(self, text, max_length=None, padding='max_length',
                  truncation=True, return_tensors='pt'):
+        """编码为 [1, L] 张量；pin_memory=True 时为锁页内存，搬运时建议 .to(device, non_blocking=True)"""
         max_len = max_length or self.max_length
         ids = self.encode(text)
         ids = [self.token2id[self.cls_token]] + ids + [self.token2id[self.sep_token]]
 
         if truncation:
             ids = ids[:max_len]
-        attention_mask = [1] * len(ids)
-
-        if padding == 'max_length' and len(ids) < max_len:
-            pad_len = max_len - len(ids)
-            ids += [self.token2id[self.pad_token]] * pad_len
-            attention_mask += [0] * pad_len
+        n = len(ids)
+        width = max_len if padding == 'max_length' and n < max_len else n
+
+        # 直接分配最终的 [1, width] 缓冲区，按切片写入 ids 与 mask，不再拼接填充列表
+        input_ids = torch.empty((1, width), dtype=torch.long, pin_memory=self.pin_memory)
+        out = input_ids.numpy()
+        out[0, :n] = ids
+        out[0, n:] = self.pad_token_id
+        mask = torch.empty((1, width), dtype=torch.long, pin_memory=self.pin_memory)
+        mask_out = mask.numpy()
+        mask_out[0, :n] = 1
+        mask_out[0, n:] = 0
 
         result = {
-            'input_ids': torch.tensor(ids).unsqueeze(0),
-            'attention_mask': torch.tensor(attention_mask).unsqueeze(0)
+            'input_ids': input_ids,
+            'attention_mask': mask
         }
         return result
 
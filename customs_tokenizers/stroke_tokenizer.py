@@ -7,13 +7,90 @@ stroke_tokenizer.py
 import os
 import torch
 import json
+import numpy as np
+from numba import get_num_threads, njit, prange
+
+# 码点查找表中“无此字符”的标记
+_NO_CHAR = 0xFFFFFFFF
+# 批内文本数超过该值且有多个线程可用时才并行编码
+_PARALLEL_MIN_BATCH = 64
+
+
+@njit(nogil=True)
+def _encoded_len(text_codes, max_len, lookup, offsets):
+    """[CLS] + 笔画 ids + [SEP] 的长度，超过 max_len 截断（max_len < 0 表示不截断）"""
+    n = 2
+    for c in text_codes:
+        row = lookup[c] if c < lookup.shape[0] else _NO_CHAR
+        n += 1 if row == _NO_CHAR else offsets[row + 1] - offsets[row]
+    if 0 <= max_len < n:
+        n = max_len
+    return n
+
+
+@njit(nogil=True)
+def _fill(text_codes, cls_id, sep_id, unk_id, lookup, offsets, stroke_ids, out):
+    """把 [CLS] + 笔画 ids + [SEP] 写入 out，写满 out 即截断"""
+    n = out.shape[0]
+    if n == 0:
+        return
+    out[0] = cls_id
+    k = 1
+    for c in text_codes:
+        if k >= n:
+            return
+        row = lookup[c] if c < lookup.shape[0] else _NO_CHAR
+        if row == _NO_CHAR:
+            out[k] = unk_id
+            k += 1
+        else:
+            for j in range(offsets[row], offsets[row + 1]):
+                if k >= n:
+                    return
+                out[k] = stroke_ids[j]
+                k += 1
+    if k < n:
+        out[k] = sep_id
+
+
+@njit(nogil=True)
+def _encode(text_codes, cls_id, sep_id, unk_id, max_len, lookup, offsets, stroke_ids):
+    """码点序列 -> [CLS] + 笔画 ids + [SEP]，超过 max_len 截断（max_len < 0 表示不截断）"""
+    ids = np.empty(_encoded_len(text_codes, max_len, lookup, offsets), dtype=np.int64)
+    _fill(text_codes, cls_id, sep_id, unk_id, lookup, offsets, stroke_ids, ids)
+    return ids
+
+
+def _batch_lengths(codes, text_offsets, max_len, lookup, offsets):
+    """整批文本的编码长度；codes 为拼接后的码点，第 i 条文本为 codes[text_offsets[i]:text_offsets[i + 1]]"""
+    lengths = np.empty(text_offsets.shape[0] - 1, dtype=np.int64)
+    for i in prange(lengths.shape[0]):
+        lengths[i] = _encoded_len(codes[text_offsets[i]:text_offsets[i + 1]], max_len, lookup, offsets)
+    return lengths
+
+
+def _encode_batch(codes, text_offsets, lengths, cls_id, sep_id, unk_id, lookup, offsets, stroke_ids, out):
+    """逐行把整批文本编码写入已用 [PAD] 填充的 out[B, max_len]"""
+    for i in prange(lengths.shape[0]):
+        _fill(codes[text_offsets[i]:text_offsets[i + 1]], cls_id, sep_id, unk_id,
+              lookup, offsets, stroke_ids, out[i, :lengths[i]])
+
+
+# 各行相互独立：大批量用 parallel 版本按行分到多核，小批量用单线程版本避免线程调度开销
+# （非 parallel 编译时 prange 等同 range）
+_batch_lengths_par = njit(nogil=True, parallel=True)(_batch_lengths)
+_encode_batch_par = njit(nogil=True, parallel=True)(_encode_batch)
+_batch_lengths = njit(nogil=True)(_batch_lengths)
+_encode_batch = njit(nogil=True)(_encode_batch)
+
 
 class StrokeTokenizer:
-    def __init__(self, zh2text_file=None, max_length=256):
+    def __init__(self, zh2text_file=None, max_length=256, pin_memory=False):
         """
         Args:
             zh2text_file: zh2letter.txt 文件路径。如果为空，则自动在当前目录下寻找。
             max_length: 最大长度
+            pin_memory: 为 True 时输出张量分配在锁页内存上，便于 .to(device, non_blocking=True) 异步拷贝
         """
         # 自动定位 zh2letter.txt
         if zh2text_file is None:
@@ -23,7 +100,18 @@ class StrokeTokenizer:
         if not os.path.exists(zh2text_file):
             print(f"[警告] 未找到 {zh2text_file}")
 
+        self._init_special_tokens(max_length, pin_memory)
+
+        # 加载笔画映射
+        self._char2stroke, strokes = self._load_zh2text(zh2text_file)
+        # 构建词表
+        self._build_vocab(strokes)
+        # 查找表已转为紧凑的 numpy 数组，释放解析用的 dict；访问 char2stroke 时再按需还原
+        self._char2stroke = None
+
+    def _init_special_tokens(self, max_length, pin_memory=False):
         self.max_length = max_length
+        self.pin_memory = pin_memory
         self.pad_token = '[PAD]'
         self.unk_token = '[UNK]'
         self.cls_token = '[CLS]'
@@ -32,78 +120,168 @@ class StrokeTokenizer:
             self.pad_token, self.unk_token, self.cls_token, self.sep_token
         ]
 
-        # 加载笔画映射
-        self.char2stroke = self._load_zh2text(zh2text_file)
-        # 构建词表
-        self._build_vocab()
-        self.pad_token_id = self.stroke2id[self.pad_token]
+    @classmethod
+    def load_binary(cls, path, max_length=256, pin_memory=False):
+        """
+        以 mmap 方式加载 save_binary 导出的目录，跳过 zh2letter.txt 的解析和词表构建。
+        多进程 fork 后各 worker 共享同一份只读页面。
+
+        Args:
+            path: save_binary 写出的目录
+            max_length: 最大长度
+            pin_memory: 输出张量是否使用锁页内存
+        """
+        tokenizer = cls.__new__(cls)
+        tokenizer._init_special_tokens(max_length, pin_memory)
+        with open(os.path.join(path, 'stroke2id.json'), 'r', encoding='utf-8') as f:
+            tokenizer.stroke2id = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in ('char_codes', 'offsets', 'stroke_ids', 'lookup')
+        }
+        tokenizer._cp = arrays['char_codes']
+        tokenizer._offsets = arrays['offsets']
+        tokenizer._stroke_ids = arrays['stroke_ids']
+        tokenizer._char2stroke = None
+        tokenizer._build_lookup(arrays['lookup'])
+        return tokenizer
+
+    @classmethod
+    def from_cache(cls, path, max_length=256, pin_memory=False):
+        """load_binary 的别名，path 为 save_binary 写出的目录"""
+        return cls.load_binary(path, max_length, pin_memory)
+
+    def save_binary(self, path):
+        """把词表导出为目录：各查找表存为 .npy（可 mmap），stroke2id 存为 json"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'char_codes.npy'), self._cp)
+        np.save(os.path.join(path, 'offsets.npy'), self._offsets)
+        np.save(os.path.join(path, 'stroke_ids.npy'), self._stroke_ids)
+        np.save(os.path.join(path, 'lookup.npy'), self._lookup)
+        with open(os.path.join(path, 'stroke2id.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.stroke2id, f, ensure_ascii=False, indent=2)
+
+    @property
+    def char2stroke(self):
+        """汉字 -> 笔画串；从缓存加载时按需由 SoA 数组还原"""
+        if self._char2stroke is None:
+            strokes = self._id2stroke_arr[self._stroke_ids]
+            self._char2stroke = {
+                chr(c): ''.join(strokes[start:end])
+                for c, start, end in zip(self._cp.tolist(), self._offsets[:-1].tolist(), self._offsets[1:].tolist())
+            }
+        return self._char2stroke
 
     def _load_zh2text(self, filepath):
-        """读取汉字到笔画的映射"""
+        """读取汉字到笔画的映射，单遍解析的同时收集笔画符号集"""
         mapping = {}
+        stroke_bytes = bytearray()
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
+            with open(filepath, 'rb') as f:
                 for line in f:
-                    parts = line.strip().split()
+                    parts = line.split(None, 2)
                     if len(parts) >= 2:
-                        mapping[parts[0]] = parts[1]
+                        mapping[parts[0].decode('utf-8')] = parts[1].decode('utf-8')
+                        stroke_bytes += parts[1]
         except FileNotFoundError:
             print(f"[Warning] file {filepath} not found.")
-        return mapping
-
-    def _build_vocab(self):
-        """根据映射构建笔画词表"""
-        strokes = set()
-        for v in self.char2stroke.values():
-            for s in v:
-                strokes.add(s)
-        strokes = sorted(list(strokes))
+
+        # 256 项字节出现表：笔画符号均为 ASCII 时，出现过的字节即为符号集
+        seen = np.bincount(np.frombuffer(stroke_bytes, dtype=np.uint8), minlength=256)
+        if seen[0x80:].any():
+            strokes = sorted(set(''.join(mapping.values())))
+        else:
+            strokes = [chr(b) for b in np.flatnonzero(seen)]
+        return mapping, strokes
+
+    def _build_vocab(self, strokes):
+        """根据笔画符号集（已排序）构建笔画词表"""
         self.stroke2id = {s: i + 4 for i, s in enumerate(strokes)}  # 预留4个特殊符号
         self.stroke2id[self.pad_token] = 0
         self.stroke2id[self.unk_token] = 1
         self.stroke2id[self.cls_token] = 2
         self.stroke2id[self.sep_token] = 3
+
+        # SoA 存储：按码点排序的字符数组 + CSR 形式的笔画 id（offsets + values）
+        chars = sorted(ch for ch in self.char2stroke if len(ch) == 1)
+        lens = np.array([len(self.char2stroke[ch]) for ch in chars], dtype=np.int32)
+        self._cp = np.array([ord(ch) for ch in chars], dtype=np.int32)
+        self._offsets = np.zeros(len(chars) + 1, dtype=np.int32)
+        np.cumsum(lens, out=self._offsets[1:])
+        stroke_seq = ''.join(self.char2stroke[ch] for ch in chars)
+        if all(len(s) == 1 and s.isascii() for s in strokes):
+            # 笔画符号均为单字节 ASCII：用 256 项转换表一次 translate 完成 符号 -> id
+            tbl = bytearray([self.stroke2id[self.unk_token]]) * 256
+            for s in strokes:
+                tbl[ord(s)] = self.stroke2id[s]
+            self._stroke_ids = np.frombuffer(
+                stroke_seq.encode('ascii').translate(bytes(tbl)), dtype=np.uint8
+            ).astype(np.int16)
+        else:
+            self._stroke_ids = np.array([self.stroke2id[s] for s in stroke_seq], dtype=np.int16)
+        self._build_lookup()
+
+    def _build_lookup(self, lookup=None):
+        """由 stroke2id 和 _cp 构建反查表，以及供编码内核 O(1) 查字的稠密码点 -> 行号表（可直接传入已有的表）"""
         self.id2stroke = {v: k for k, v in self.stroke2id.items()}
         self.vocab_size = len(self.stroke2id)
+        self.pad_token_id = self.stroke2id[self.pad_token]
+        self._cls_id = self.stroke2id[self.cls_token]
+        self._sep_id = self.stroke2id[self.sep_token]
+        self._unk_id = self.stroke2id[self.unk_token]
+
+        if lookup is None:
+            size = max(0x10000, int(self._cp[-1]) + 1 if len(self._cp) else 0)
+            lookup = np.full(size, _NO_CHAR, dtype=np.uint32)
+            lookup[self._cp] = np.arange(len(self._cp), dtype=np.uint32)
+        self._lookup = lookup
+        # id -> 笔画符号，用于把 id 数组映射回字符串
+        self._id2stroke_arr = np.array(
+            [self.id2stroke[i] for i in range(len(self.id2stroke))], dtype=object
+        )
 
     def text_to_strokes(self, text):
-        """汉字 -> 笔画序列"""
-        strokes = []
-        for ch in text:
-            if ch in self.char2stroke:
-                strokes.extend(list(self.char2stroke[ch]))
-            else:
-                strokes.append(self.unk_token)
-        return strokes
+        """汉字 -> 笔画序列（复用编码内核，去掉首尾的 [CLS]/[SEP]）"""
+        return self._id2stroke_arr[self._encode_one(text, -1)[1:-1]].tolist()
+
+    def _encode_one(self, text, limit):
+        """单条文本 -> 笔画 ids（numpy 数组，limit < 0 表示不截断）"""
+        text_codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        return _encode(text_codes, self._cls_id, self._sep_id, self._unk_id, limit,
+                       self._lookup, self._offsets, self._stroke_ids)
 
     def __call__(self, texts, return_tensors=None, padding=True, truncation=True, max_length=None):
-        """兼容 transformers 调用风格"""
+        """兼容 transformers 调用风格；pin_memory=True 时返回锁页内存张量，搬运时建议 .to(device, non_blocking=True)"""
         if isinstance(texts, str):
             texts = [texts]
         if max_length is None:
             max_length = self.max_length
 
-        all_ids = []
-        for text in texts:
-            strokes = self.text_to_strokes(text)
-            ids = [self.stroke2id.get(self.cls_token)]
-            ids.extend([self.stroke2id.get(s, self.stroke2id[self.unk_token]) for s in strokes])
-            ids.append(self.stroke2id.get(self.sep_token))
-            if truncation and len(ids) > max_length:
-                ids = ids[:max_length]
-            all_ids.append(ids)
-
-        # padding
-        if padding:
-            pad_id = self.stroke2id[self.pad_token]
-            max_len = max(len(ids) for ids in all_ids)
-            for ids in all_ids:
-                ids += [pad_id] * (max_len - len(ids))
-
-        input_ids = torch.tensor(all_ids, dtype=torch.long)
-        attention_mask = (input_ids != self.stroke2id[self.pad_token]).long()
+        limit = max_length if truncation else -1
+
+        # 整批文本拼接后一次性转码点，长度统计与编码各只调用一次内核
+        codes = np.frombuffer(''.join(texts).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)), out=text_offsets[1:])
+        parallel = len(texts) > _PARALLEL_MIN_BATCH and get_num_threads() > 1
+        batch_lengths = _batch_lengths_par if parallel else _batch_lengths
+        encode_batch = _encode_batch_par if parallel else _encode_batch
+        lengths = batch_lengths(codes, text_offsets, limit, self._lookup, self._offsets)
+
+        # padding：一次性分配 [B, max_len] 矩阵，由内核逐行填充
+        max_len = int(lengths.max())
+        if not padding and (lengths != max_len).any():
+            raise ValueError("padding=False 时批内各序列长度必须一致")
+        input_ids = torch.empty((len(texts), max_len), dtype=torch.long, pin_memory=self.pin_memory)
+        out = input_ids.numpy()
+        out.fill(self.pad_token_id)
+        encode_batch(codes, text_offsets, lengths, self._cls_id, self._sep_id, self._unk_id,
+                     self._lookup, self._offsets, self._stroke_ids, out)
+
+        attention_mask = torch.empty((len(texts), max_len), dtype=torch.long, pin_memory=self.pin_memory)
+        attention_mask.numpy()[:] = np.arange(max_len) < lengths[:, None]
 
         if return_tensors == "pt":
             return {"input_ids": input_ids, "attention_mask": attention_mask}
         else:
-            return {"input_ids": all_ids, "attention_mask": attention_mask}
\ No newline at end of file
+            return {"input_ids": out.tolist(), "attention_mask": attention_mask}